@@ -7,18 +7,22 @@
 #
 # author:   Murray Altheim
 # created:  2025-07-04
-# modified: 2025-10-23
+# modified: 2026-10-14
 #
 # A pseudo-enum for Payload commands.
 
 class Command:
     _instances = []
+    _by_code   = {}
 
     def __init__(self, index, code, description):
         self._index = index
         self._code = code
+        self._code_bytes = code.encode('ascii')
         self._description = description
         Command._instances.append(self)
+        Command._by_code[code] = self
+        Command._by_code[self._code_bytes] = self # for lookups on packed codes
 
     @property
     def index(self):
@@ -28,6 +32,13 @@ class Command:
     def code(self):
         return self._code
 
+    @property
+    def code_bytes(self):
+        '''
+        The code as bytes, as packed into a Payload.
+        '''
+        return self._code_bytes
+
     @property
     def description(self):
         return self._description
@@ -49,12 +60,20 @@ class Command:
                 return inst
         raise ValueError("no Command with index '{}'".format(index))
 
+    @classmethod
+    def get_by_code(cls, code):
+        '''
+        Return the Command with the code, which may be given either as a
+        str or as bytes (as packed), or None if there is none.
+        '''
+        return cls._by_code.get(code)
+
     @classmethod
     def from_code(cls, code):
-        for inst in cls._instances:
-            if inst.code == code:
-                return inst
-        raise ValueError("no Command with code '{}'".format(code))
+        inst = cls._by_code.get(code)
+        if inst is None:
+            raise ValueError("no Command with code '{}'".format(code))
+        return inst
 
 # instances
 Command.COLOR       = Command( 0, "CO", "show color")       # sets a status RGB LED color
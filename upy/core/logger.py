@@ -7,7 +7,7 @@
 #
 # author:   Murray Altheim
 # created:  2020-01-14
-# modified: 2025-04-26
+# modified: 2026-10-14
 
 # this is a simplification of the MROS Logger class, just using print statements
 # and not supporting log-to-file, log suppression, the notice() or critical()
@@ -117,13 +117,18 @@ class Logger:
         return level >= self._level
 
     # ┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈
-    def debug(self, message):
+    def debug(self, message, *args):
         '''
         Prints a debug message.
 
+        If args are provided the message is treated as a format string, and is
+        only formatted if the message is actually printed.
+
         The optional 'end' argument is for special circumstances where a different end-of-line is desired.
         '''
         if self.is_at_least(Level.DEBUG):
+            if args:
+                message = message.format(*args)
             timestamp = self._get_time()
             print(Fore.BLUE + "{} : ".format(timestamp) 
                     + Style.DIM + Fore.RESET
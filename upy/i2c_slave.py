@@ -7,13 +7,15 @@
 #
 # author:   Murray Altheim
 # created:  2025-01-17
-# modified: 2025-01-21
+# modified: 2026-10-14
 
 import sys
 import time
+import micropython
 from pyb import Timer
 from pyb import LED
 from machine import I2CTarget
+from machine import disable_irq, enable_irq
 from colorama import Fore, Style
 
 from core.logger import Logger, Level
@@ -22,6 +24,67 @@ from payload import Payload
 from response import Response
 from motor_controller import MotorController
 
+# packet bytes used to recognise a PING without deserialising it
+_SYNC_0      = Payload.SYNC_HEADER[0]
+_SYNC_1      = Payload.SYNC_HEADER[1]
+_CODE_OFFSET = Payload.CODE_OFFSET
+_PING_0      = ord(Command.PING.code[0])
+_PING_1      = ord(Command.PING.code[1])
+
+# per-command debug message formats, with their colour prefixes
+_FMT_STOP = Fore.RED + Style.DIM + '[{:05d}] command: STOP'
+_FMT_GO   = Fore.GREEN + '[{:05d}] command: GO (pfwd={:.2f}, sfwd={:.2f}, paft={:.2f}, saft={:.2f})'
+
+# fixed response values
+_ZERO_SPEEDS = (0.0, 0.0, 0.0, 0.0)
+_PING_SPEEDS = (0.3, 0.3, 0.3, 0.3)
+
+# response codes, pre-encoded for packing
+_ACK_CODE      = Command.ACK.code_bytes
+_RESPONSE_CODE = Command.RESPONSE.code_bytes
+_ERROR_CODE    = Command.ERROR.code_bytes
+
+_PACKET_SIZE   = Payload.PACKET_SIZE
+_SPEEDS_OFFSET = _CODE_OFFSET + 2 # offset of the four floats within a packet
+_SPEEDS_SIZE   = Payload.PAYLOAD_SIZE - 2
+_CRC_OFFSET    = _PACKET_SIZE - Payload.CRC_SIZE
+_RING_SLOTS    = 4 # command ring buffer slots; holds _RING_SLOTS - 1 commands
+
+# the hard IRQ handler cannot allocate, so provide for exceptions raised there
+micropython.alloc_emergency_exception_buf(100)
+
+@micropython.viper
+def _copy_packet(dst: ptr8, src: ptr8):
+    '''
+    Copy one packet from src to dst. Unlike slice assignment, this creates
+    no slice object.
+    '''
+    n = int(_PACKET_SIZE)
+    i = 0
+    while i < n:
+        dst[i] = src[i]
+        i += 1
+
+@micropython.viper
+def _pack_speeds(dst: ptr8, code: ptr8, speeds: ptr8):
+    '''
+    Write the sync header, the two-byte code and the four speeds into the
+    packet dst, leaving its CRC unset. The speeds are an array('f'), whose
+    little-endian float32 values are copied byte for byte, as they already
+    match the packet layout.
+    '''
+    dst[0] = int(_SYNC_0)
+    dst[1] = int(_SYNC_1)
+    off = int(_CODE_OFFSET)
+    dst[off] = code[0]
+    dst[off + 1] = code[1]
+    off = int(_SPEEDS_OFFSET)
+    n = int(_SPEEDS_SIZE)
+    i = 0
+    while i < n:
+        dst[off + i] = speeds[i]
+        i += 1
+
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 class I2CSlave(object):
     # Memory map constants
@@ -33,8 +96,11 @@ class I2CSlave(object):
     memory-mapped buffers.
     
     Memory Map:
-        Bytes 0-22:  command buffer (23 bytes for Payload)
-        Bytes 23-45: response buffer (23 bytes for Payload)
+        Bytes 0-20:  command buffer (21 bytes for Payload)
+        Bytes 21-41: response buffer (21 bytes for Payload)
+
+    The buffer is only ever accessed via the command and response
+    memoryviews created once in __init__.
     '''
     def __init__(self, config=None, level=Level.INFO):
         '''
@@ -62,10 +128,38 @@ class I2CSlave(object):
             self._i2c_address = _i2c_address
         self._led      = LED(1)
         self._i2c      = None
-        self._debug    = True
+        self._debug    = self._log.is_at_least(Level.DEBUG) # per-command logging
         self._tx_count = 0
         self._mem      = bytearray(self.MEMORY_SIZE)
+        # preallocated so that the IRQ handler need not allocate:
+        self._mem_mv   = memoryview(self._mem)
+        self._cmd_mv   = self._mem_mv[self.CMD_OFFSET:self.CMD_OFFSET + Payload.PACKET_SIZE]
+        self._rsp_mv   = self._mem_mv[self.RSP_OFFSET:self.RSP_OFFSET + Payload.PACKET_SIZE]
+        self._zero_rsp = bytes(Payload.PACKET_SIZE)
+        # responses that never vary, packed once
+        self._ping_rsp     = Payload(Command.PING, *_PING_SPEEDS).to_bytes()
+        self._ack_zero_rsp = Payload(Command.ACK, *_ZERO_SPEEDS).to_bytes()
+        self._error_rsp    = Payload(Command.ERROR, *_ZERO_SPEEDS).to_bytes()
+        self._cmd_payload = Payload(Command.NACK, *_ZERO_SPEEDS) # reused by Payload.parse_into()
+        # ring buffer of commands copied out by the IRQ handler
+        self._ring     = bytearray(_RING_SLOTS * Payload.PACKET_SIZE)
+        _ring_mv       = memoryview(self._ring)
+        self._slots    = [ _ring_mv[i * Payload.PACKET_SIZE:(i + 1) * Payload.PACKET_SIZE] for i in range(_RING_SLOTS) ]
+        self._head     = 0 # next slot written by the IRQ handler
+        self._tail     = 0 # next slot read by _process_cmd_scheduled()
+        self._dropped  = 0 # commands dropped because the ring was full
+        self._scheduled = False # True while a drain is scheduled but not yet started
+        self._process_cmd_ref = self._process_cmd_scheduled
         self._motor_controller = MotorController(config, level)
+        # command dispatch table, keyed by Command:
+        self._dispatch = {
+            Command.PING:    self._handle_ping,
+            Command.STOP:    self._handle_stop,
+            Command.GO:      self._handle_go,
+            Command.REQUEST: self._handle_request,
+            Command.ENABLE:  self._handle_enable,
+            Command.DISABLE: self._handle_disable
+        }
         # keepalive timer:
         self._last_command_time_ms = 0
         self._keepalive_timeout_ms = 200
@@ -75,7 +169,7 @@ class I2CSlave(object):
         '''
         Clear the response buffer.
         '''
-        self._mem[self.RSP_OFFSET:self.RSP_OFFSET + Payload.PACKET_SIZE] = bytearray(Payload.PACKET_SIZE)
+        self._emit_packet(self._zero_rsp)
     
     def enable(self):
         '''
@@ -88,11 +182,12 @@ class I2CSlave(object):
         # Create I2C target with memory buffer
         self._i2c = I2CTarget(self._i2c_id, self._i2c_address, mem=self._mem)
         
-        # Register IRQ handler for end of read/write transactions
-        # Using soft IRQ (hard=False) since we have a memory buffer
+        # Register IRQ handler for end of write transactions; reads are served
+        # from the memory buffer and need no handling.
+        # Using hard IRQ (hard=True): the handler only copies into the ring buffer
         self._i2c.irq(handler=self._irq_handler, 
-                     trigger=I2CTarget.IRQ_END_READ | I2CTarget.IRQ_END_WRITE,
-                     hard=False)
+                     trigger=I2CTarget.IRQ_END_WRITE,
+                     hard=True)
         self._log.info('I2C slave enabled on address {:#04x}.'.format(self._i2c_address))
         self._log.info(Fore.WHITE + 'I2C slave running; press Ctrl+C to stop.')
     
@@ -105,81 +200,152 @@ class I2CSlave(object):
             self._i2c = None
             self._log.info('I2C slave disabled')
  
+    @micropython.viper
     def _irq_handler(self, i2c_target):
         '''
         Handle I2C events from master.
+
+        This is a hard IRQ handler and must not allocate: it copies the command
+        out of the memory buffer into the next free slot of the ring buffer and
+        defers its processing to _process_cmd_scheduled(), which is scheduled
+        only if it is not already pending. If the ring buffer is full (one slot
+        is always left empty, so it holds _RING_SLOTS - 1 commands) the command
+        is dropped.
         '''
-        flags = i2c_target.irq().flags()
-        if flags & I2CTarget.IRQ_END_WRITE:
-            # master wrote a command - process it immediately
+        flags = int(i2c_target.irq().flags())
+        if (flags & int(I2CTarget.IRQ_END_WRITE)) == 0:
+            return # nothing to do unless the master wrote a command
+        head = int(self._head)
+        next_head = head + 1
+        if next_head == int(_RING_SLOTS):
+            next_head = 0
+        if next_head == int(self._tail):
+            self._dropped = int(self._dropped) + 1
+            return
+        # master wrote a command - copy it into the ring and defer processing
+        _copy_packet(self._slots[self._head], self._cmd_mv)
+        self._head = next_head
+        # update timestamp for keepalive
+        self._last_command_time_ms = time.ticks_ms()
+        if not self._scheduled:
             try:
-                self._led.on()
-                # update timestamp for keepalive
-                self._last_command_time_ms = time.ticks_ms()
-                # parse command payload from command buffer
-                cmd_bytes = bytes(self._mem[self.CMD_OFFSET:self.CMD_OFFSET + Payload.PACKET_SIZE])
-                cmd_payload = Payload.from_bytes(cmd_bytes)
-#               if self._debug:
-#                   self._log.debug('rx: {}'.format(cmd_payload))
-                # process command based on Command
-                command = Command.from_code(cmd_payload.code)
-                if command is Command.PING:
-                    self._handle_ping()
-                elif command is Command.STOP:
-                    self._handle_stop()
-                elif command is Command.GO:
-                    self._handle_go(cmd_payload)
-                elif command is Command.REQUEST:
-                    self._handle_request()
-                elif command is Command.ENABLE:
-                    self._handle_enable()
-                elif command is Command.DISABLE:
-                    self._handle_disable()
-                else:
-                    self._handle_error(1, 'unknown command: {}'.format(cmd_payload.code))
-                self._tx_count += 1
-
-            except ValueError as e:
-                # bad payload - silently ignore sync header issues (i2cdetect probing)
-                error_msg = str(e)
-                if 'invalid sync header' not in error_msg:
-                    self._log.error('payload error: {}'.format(e))
-                    self._handle_error(2, error_msg)
-                else:
-                    self._log.warning('payload warning: {}'.format(e))
-                    self._handle_error(3, error_msg)
-                    
-            except Exception as e:
-                self._log.error('{} raised in irq handler: {}'.format(type(e), e))
-                sys.print_exception(e)
-                self._handle_error(4, str(e))
-        
-#       if self._debug:
-#           if flags & I2CTarget.IRQ_END_READ:
-#               self._log.debug('master read response')
+                micropython.schedule(self._process_cmd_ref, None)
+                # set only once scheduled; the drain cannot preempt a hard IRQ
+                self._scheduled = True
+            except RuntimeError:
+                # schedule queue full: the command waits in the ring until
+                # check_keepalive() or the next IRQ starts a drain
+                pass
 
-    def _send_response(self, command, pfwd, sfwd, paft, saft):
+    def _process_cmd_scheduled(self, _):
+        '''
+        Drain the ring buffer, processing each command in the order received.
+        This is called via micropython.schedule() and so runs outside IRQ
+        context; one call handles any burst of commands that arrived since
+        it was scheduled.
         '''
-        Write response Payload to response buffer.
+        # cleared first, so a command arriving during the drain schedules another
+        self._scheduled = False
+        _dropped = self._dropped
+        if _dropped:
+            self._log.warning('command ring buffer full: {} command(s) dropped.'.format(_dropped))
+            # subtract rather than reset, keeping any drops counted by the IRQ meanwhile
+            _state = disable_irq()
+            self._dropped -= _dropped
+            enable_irq(_state)
+        _tail = self._tail
+        while _tail != self._head:
+            self._process_cmd(self._slots[_tail])
+            # release the slot back to the IRQ handler
+            _tail = (_tail + 1) % _RING_SLOTS
+            self._tail = _tail
+
+    def _process_cmd(self, packet):
+        '''
+        Parse and dispatch a single command packet.
+
+        Args:
+            packet: the command packet, as a memoryview into the ring buffer
         '''
         try:
-            if not isinstance(command, Command):
-                raise TypeError('expected command, not {}'.format(type(command)))
-            response = Payload(command, pfwd, sfwd, paft, saft)
-            response_bytes = response.to_bytes() 
-            # write to response buffer atomically using slice assignment
-            self._mem[self.RSP_OFFSET:self.RSP_OFFSET + len(response_bytes)] = response_bytes
-#           if self._debug:
-#               # debug: Show entire memory map
-#               self._log.debug('full memory: {}'.format(' '.join('{:02x}'.format(b) for b in self._mem)))
-#               self._log.debug('response ready: {}'.format(response))
-            time.sleep_us(50) # make sure response is committed before IRQ completes
+            if (packet[_CODE_OFFSET] == _PING_0 and packet[_CODE_OFFSET + 1] == _PING_1
+                    and packet[0] == _SYNC_0 and packet[1] == _SYNC_1):
+                # fast path: a PING carries no data, so skip deserialisation
+                self._handle_ping(None)
+            else:
+                # parse command payload in place from its ring slot
+                cmd_payload = self._cmd_payload
+                _status = Payload.parse_into(packet, cmd_payload)
+                if _status == Payload.OKAY:
+#                   if self._debug:
+#                       self._log.debug('rx: {}'.format(cmd_payload))
+                    # dispatch command to its handler
+                    handler = self._dispatch.get(cmd_payload.command)
+                    if handler:
+                        handler(cmd_payload)
+                    else:
+                        self._handle_error(1, 'unknown command: {}'.format(cmd_payload.code))
+                elif _status == Payload.BAD_SYNC:
+                    # bad sync header: quietly answer with an error (i2cdetect probing)
+                    if self._debug:
+                        self._log.debug('payload warning: invalid sync header')
+                    self._emit_error(3)
+                    return
+                else:
+                    self._handle_error(2, 'payload error: {}'.format(Payload.STATUS_MESSAGES[_status]))
+                    return
+            self._tx_count += 1
+            if (self._tx_count & 0x0F) == 0:
+                self._led.toggle() # heartbeat: blinks once per 32 commands
 
         except Exception as e:
-            self._log.error('{} raised sending response: {}'.format(type(e), e))
-            sys.print_exception(e)
-        finally:
-            self._led.off()
+            # last resort: log and continue
+            self._log.error('{} raised processing command: {}'.format(type(e), e))
+            if self._debug:
+                sys.print_exception(e)
+            self._handle_error(4, str(e))
+
+    # response emitters ┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈
+
+    def _emit_packet(self, packet):
+        '''
+        Copy a precomputed response packet into the response buffer.
+        '''
+        _copy_packet(self._rsp_mv, packet)
+
+    def _emit_speeds(self, code, speeds):
+        '''
+        Copy the code and the speeds array into the response buffer, then
+        write its CRC. The floats are copied as bytes, never read back as
+        (heap-allocated) float objects.
+        '''
+        _rsp_mv = self._rsp_mv
+        _pack_speeds(_rsp_mv, code, speeds)
+        _rsp_mv[_CRC_OFFSET] = Payload.calculate_crc8(_rsp_mv, _CODE_OFFSET, _CRC_OFFSET)
+
+    def _emit_ack(self, speeds):
+        '''
+        Pack an ACK response carrying the speeds array into the response buffer.
+        '''
+        self._emit_speeds(_ACK_CODE, speeds)
+
+    def _emit_response(self, speeds):
+        '''
+        Pack a RESPONSE carrying the speeds array into the response buffer.
+        '''
+        self._emit_speeds(_RESPONSE_CODE, speeds)
+
+    def _emit_error(self, error_code):
+        '''
+        Pack an ERROR response, with the error code in position 1, into the
+        response buffer.
+        '''
+        Payload.pack_values_into(self._rsp_mv, 0, _ERROR_CODE,
+                float(error_code), 0.0, 0.0, 0.0)
+#       if self._debug:
+#           # debug: Show entire memory map
+#           self._log.debug('full memory: {}'.format(' '.join('{:02x}'.format(b) for b in self._mem_mv)))
+#           self._log.debug('response ready: {}'.format(Payload.from_bytes(self._rsp_mv)))
 
     # keepalive timer ┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈
 
@@ -187,7 +353,12 @@ class I2CSlave(object):
         '''
         Check if keepalive timeout has expired and stop motors if needed.
         Must be called periodically from main loop.
+
+        This also drains any commands left waiting in the ring buffer when
+        the IRQ handler was unable to schedule their processing.
         '''
+        if not self._scheduled and self._tail != self._head:
+            self._process_cmd_scheduled(None)
         if self._motor_controller.enabled and self._last_command_time_ms > 0:
             elapsed = time.ticks_diff(time.ticks_ms(), self._last_command_time_ms)
             if elapsed > self._keepalive_timeout_ms:
@@ -198,26 +369,25 @@ class I2CSlave(object):
 
     # command handlers ┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈
     
-    def _handle_ping(self):
+    def _handle_ping(self, payload):
         '''
         Respond to PING with another PING.
         '''
         if self._debug:
-            self._log.info('command: PING')
-        self._send_response(Command.PING, 0.3, 0.3, 0.3, 0.3)
+            self._log.debug('command: PING')
+        self._emit_packet(self._ping_rsp)
     
-    def _handle_stop(self):
+    def _handle_stop(self, payload):
         '''
         Handle STOP command - stop all motors.
         '''
         if self._debug:
-            self._log.info(Fore.RED + Style.DIM + '[{:05d}] command: STOP'.format(self._tx_count))
+            self._log.debug(_FMT_STOP, self._tx_count)
         _response = self._motor_controller.stop()
         if _response is Response.OKAY:
-            _speeds = self._motor_controller.get_speeds()
-            self._send_response(Command.ACK, *_speeds)
+            self._emit_ack(self._motor_controller.get_speeds())
         else:
-            self._send_response(Command.ERROR, 0.0, 0.0, 0.0, 0.0) # return error code in position 1
+            self._emit_packet(self._error_rsp) # return error code in position 1
     
     def _handle_go(self, payload):
         '''
@@ -227,42 +397,40 @@ class I2CSlave(object):
             payload: Command Payload containing motor speeds
         '''
         if self._debug:
-            self._log.info(Fore.GREEN + '[{:05d}] command: GO (pfwd={:.2f}, sfwd={:.2f}, paft={:.2f}, saft={:.2f})'.format(
-                    self._tx_count, payload.pfwd, payload.sfwd, payload.paft, payload.saft))
+            self._log.debug(_FMT_GO, self._tx_count, payload.pfwd, payload.sfwd, payload.paft, payload.saft)
         _response = self._motor_controller.go(payload.pfwd, payload.sfwd, payload.paft, payload.saft)
         if _response is Response.OKAY:
-            _speeds = self._motor_controller.get_speeds()
-            self._send_response(Command.ACK, *_speeds)
+            self._emit_ack(self._motor_controller.get_speeds())
         else:
-            self._send_response(Command.ERROR, 0.0, 0.0, 0.0, 0.0) # TODO return error code in position 1
+            self._emit_packet(self._error_rsp) # TODO return error code in position 1
 
-    def _handle_request(self):
+    def _handle_request(self, payload):
         '''
         Handle REQUEST command - return current motor state.
         '''
         if self._debug:
-            self._log.info('command: REQUEST')
-        self._log.info(Fore.BLUE + 'command: REQUEST')
-        _speeds = self._motor_controller.get_speeds()
-        self._send_response(Command.RESPONSE, *_speeds)
+            self._log.debug('command: REQUEST')
+        self._emit_response(self._motor_controller.get_speeds())
     
-    def _handle_enable(self):
+    def _handle_enable(self, payload):
         '''
         Handle ENABLE command - enable motors.
         '''
-        self._log.info('command: ENABLE')
+        if self._debug:
+            self._log.debug('command: ENABLE')
         self._motor_controller.enable()
         self._last_command_time_ms = time.ticks_ms() # for keepalive
-        self._send_response(Command.ACK, 0.0, 0.0, 0.0, 0.0)
+        self._emit_packet(self._ack_zero_rsp)
     
-    def _handle_disable(self):
+    def _handle_disable(self, payload):
         '''
         Handle DISABLE command - disable motors.
         '''
-        self._log.info('command: DISABLE')
+        if self._debug:
+            self._log.debug('command: DISABLE')
         self._motor_controller.disable()
         self._last_command_time_ms = 0  # clear keepalive timestamp when disabled
-        self._send_response(Command.ACK, 0.0, 0.0, 0.0, 0.0)
+        self._emit_packet(self._ack_zero_rsp)
         time.sleep_us(100)  # give master time to read the ACK response
         self._clear_response_buffer()
 
@@ -275,6 +443,6 @@ class I2CSlave(object):
             message: Error message (for logging only)
         '''
         self._log.error('Error {}: {}'.format(error_code, message))
-        self._send_response(Command.ERROR, float(error_code), 0.0, 0.0, 0.0)
+        self._emit_error(error_code)
 
 #EOF
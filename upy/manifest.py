@@ -0,0 +1,31 @@
+# manifest.py -- freezes the I2C slave modules into the MicroPython firmware
+#
+# Copyright 2020-2025 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-14
+# modified: 2026-10-14
+#
+# Frozen modules are compiled to bytecode at build time and executed from
+# flash, so they are not parsed at boot and use much less RAM. Usage, from
+# the MicroPython ports/stm32 directory:
+#
+#     make BOARD=<board> FROZEN_MANIFEST=/path/to/upy/manifest.py
+#
+# Paths below are relative to this file. main.py, boot.py and config.yaml
+# stay on the filesystem. Once flashed, delete the filesystem copies of
+# the frozen modules, which would otherwise take precedence on sys.path.
+
+include("$(PORT_DIR)/boards/manifest.py")
+
+# opt=3 also drops assertions and line-number information
+module("i2c_slave.py", opt=3)
+module("motor_controller.py", opt=3)
+module("payload.py", opt=3)
+module("command.py", opt=3)
+module("response.py", opt=3)
+module("crc8_table.py", opt=3)
+
+#EOF
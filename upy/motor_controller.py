@@ -7,14 +7,21 @@
 #
 # author:   Murray Altheim
 # created:  2025-10-21
-# modified: 2025-10-22
+# modified: 2026-10-14
 
+from array import array
 from colorama import Fore, Style
 
 from core.logger import Logger, Level
 from core.component import Component
 from response import Response
 
+_ZERO_SPEEDS = array('f', (0.0, 0.0, 0.0, 0.0))
+
+# per-command debug message formats, with their colour prefixes
+_FMT_STOP = Fore.RED + 'STOP'
+_FMT_GO   = Fore.GREEN + 'GO (pfwd={:.2f}, sfwd={:.2f}, paft={:.2f}, saft={:.2f})'
+
 class MotorController(Component):
     '''
     A controller for four brushless motors. This operates in both open- and
@@ -32,15 +39,16 @@ class MotorController(Component):
         if config is None:
             raise ValueError('no configuration provided.')
         self._config     = config
-        self._pfwd = 0.0
-        self._sfwd = 0.0
-        self._paft = 0.0
-        self._saft = 0.0
-        self._debug = False
+        self._speeds = array('f', _ZERO_SPEEDS) # pfwd, sfwd, paft, saft
+        self._debug = self._log.is_at_least(Level.DEBUG) # per-command logging
         self._log.info('ready.')
 
     def get_speeds(self):
-        return ( self._pfwd, self._sfwd, self._paft, self._saft )
+        '''
+        Return the current speeds as an array of (pfwd, sfwd, paft, saft).
+        This is the controller's own array, not a copy, and must not be modified.
+        '''
+        return self._speeds
 
     def stop(self):
         '''
@@ -49,11 +57,8 @@ class MotorController(Component):
         if not self.enabled:
             return Response.FAIL
         if self._debug:
-            self._log.info(Fore.RED + 'STOP')
-        self._pfwd = 0.0
-        self._sfwd = 0.0
-        self._paft = 0.0
-        self._saft = 0.0
+            self._log.debug(_FMT_STOP)
+        self._speeds[:] = _ZERO_SPEEDS
         return Response.OKAY
 
     def go(self, pfwd, sfwd, paft, saft):
@@ -63,11 +68,12 @@ class MotorController(Component):
         if not self.enabled:
             return Response.FAIL
         if self._debug:
-            self._log.info(Fore.GREEN + 'GO (pfwd={:.2f}, sfwd={:.2f}, paft={:.2f}, saft={:.2f})'.format(pfwd, sfwd, paft, saft))
-        self._pfwd = pfwd
-        self._sfwd = sfwd
-        self._paft = paft
-        self._saft = saft
+            self._log.debug(_FMT_GO, pfwd, sfwd, paft, saft)
+        _speeds = self._speeds
+        _speeds[0] = pfwd
+        _speeds[1] = sfwd
+        _speeds[2] = paft
+        _speeds[3] = saft
         return Response.OKAY
 
     def enable(self):
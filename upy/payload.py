@@ -7,7 +7,7 @@
 #
 # author:   Murray Altheim
 # created:  2025-06-12
-# modified: 2025-10-23
+# modified: 2026-10-14
 
 import struct
 from command import Command
@@ -17,6 +17,47 @@ try:
 except ImportError:
     from crc8_table import CRC8_TABLE # slave
 
+try:
+    import micropython # slave: native validation routines
+
+    _CRC8_BYTES = bytes(CRC8_TABLE)
+
+    @micropython.viper
+    def _check_sync(buf: ptr8, header: ptr8, n: int) -> bool:
+        i = 0
+        while i < n:
+            if buf[i] != header[i]:
+                return False
+            i += 1
+        return True
+
+    @micropython.viper
+    def _crc8(buf: ptr8, start: int, end: int) -> int:
+        table = ptr8(_CRC8_BYTES)
+        crc = 0
+        i = start
+        while i < end:
+            crc = table[crc ^ buf[i]]
+            i += 1
+        return crc
+
+except ImportError: # master: plain Python equivalents
+    # memoryview() rejects non-buffers, as viper's ptr8 does on the slave
+
+    def _check_sync(buf, header, n):
+        buf = memoryview(buf)
+        for i in range(n):
+            if buf[i] != header[i]:
+                return False
+        return True
+
+    def _crc8(buf, start, end):
+        buf = memoryview(buf)
+        crc = 0
+        for i in range(start, end):
+            crc = CRC8_TABLE[crc ^ buf[i]]
+        return crc
+
 class Payload:
     # sync header: 'zz' for human-readability. To switch to a binary header, just uncomment the next line.
     SYNC_HEADER = b'\x7A\x7A'
@@ -24,8 +65,17 @@ class Payload:
     PAYLOAD_SIZE = struct.calcsize(PACK_FORMAT) # size of code+floats only, no CRC or header
     CRC_SIZE = 1
     PACKET_SIZE = len(SYNC_HEADER) + PAYLOAD_SIZE + CRC_SIZE  # header + payload + crc
+    PACKET_FORMAT = '<2s' + PACK_FORMAT[1:] # header + payload, no CRC
+    CODE_OFFSET = len(SYNC_HEADER) # offset of the 2-char code within a packet
     VARIABLE_FORMAT = "{:2s} {:.1f} {:.1f} {:.1f} {:.1f}"
     FIXED_FORMAT    = "{:>2} {:5.1f} {:5.1f} {:5.1f} {:5.1f}"
+    # status codes returned by validate() and parse_into()
+    OKAY     = 0
+    BAD_SIZE = 1
+    BAD_SYNC = 2
+    BAD_CRC  = 3
+    BAD_CODE = 4
+    STATUS_MESSAGES = ("okay", "invalid packet size", "invalid sync header", "CRC mismatch.", "unknown command code")
 
     def __init__(self, command, pfwd, sfwd, paft, saft):
         if not isinstance(command, Command):
@@ -112,27 +162,91 @@ class Payload:
         crc = self.calculate_crc8(packed)
         return Payload.SYNC_HEADER + packed + bytes([crc])
 
+    def pack_into(self, buffer, offset=0):
+        '''
+        Serialise this Payload directly into a writable buffer (a bytearray
+        or memoryview) starting at offset, without creating an intermediate
+        bytes object.
+        '''
+        _code  = self._code.encode('ascii') if isinstance(self._code, str) else self._code
+        Payload.pack_values_into(buffer, offset, _code, self._pfwd, self._sfwd, self._paft, self._saft)
+
+    @staticmethod
+    def pack_values_into(buffer, offset, code, pfwd, sfwd, paft, saft):
+        '''
+        Serialise a packet from its values directly into a writable buffer
+        starting at offset, without creating a Payload. The code must be
+        provided as two bytes, e.g., Command.code_bytes.
+        '''
+        struct.pack_into(Payload.PACKET_FORMAT, buffer, offset, Payload.SYNC_HEADER,
+                code, pfwd, sfwd, paft, saft)
+        _start = offset + len(Payload.SYNC_HEADER)
+        _end   = offset + Payload.PACKET_SIZE - Payload.CRC_SIZE
+        buffer[_end] = _crc8(buffer, _start, _end)
+
     @classmethod
-    def from_bytes(cls, packet):
+    def validate(cls, packet):
+        '''
+        Check the size, sync header and CRC of packet, returning a status
+        code: Payload.OKAY if valid, otherwise BAD_SIZE, BAD_SYNC or BAD_CRC.
+        '''
         if len(packet) != cls.PACKET_SIZE:
+            return cls.BAD_SIZE
+        if not _check_sync(packet, Payload.SYNC_HEADER, len(Payload.SYNC_HEADER)):
+            return cls.BAD_SYNC
+        _end = cls.PACKET_SIZE - cls.CRC_SIZE
+        if packet[_end] != _crc8(packet, len(Payload.SYNC_HEADER), _end):
+            return cls.BAD_CRC
+        return cls.OKAY
+
+    @classmethod
+    def parse_into(cls, packet, payload):
+        '''
+        Deserialise packet into an existing Payload, overwriting its fields.
+        Rather than raising an exception on a malformed packet this returns
+        a status code, Payload.OKAY on success; on failure the payload is
+        left unchanged.
+        '''
+        status = cls.validate(packet)
+        if status != cls.OKAY:
+            return status
+        code, pfwd, sfwd, paft, saft = struct.unpack_from(cls.PACK_FORMAT, packet, len(Payload.SYNC_HEADER))
+        command = Command.get_by_code(code)
+        if command is None:
+            return cls.BAD_CODE
+        payload._command = command
+        payload._code = command.code
+        payload._pfwd = pfwd
+        payload._sfwd = sfwd
+        payload._paft = paft
+        payload._saft = saft
+        return cls.OKAY
+
+    @classmethod
+    def from_bytes(cls, packet):
+        '''
+        Deserialise a Payload from packet, which may be any bytes-like object
+        (bytes, bytearray or memoryview). The packet is read in place.
+        '''
+        status = cls.validate(packet)
+        if status == cls.BAD_SIZE:
             raise ValueError("invalid packet size: {}".format(len(packet)))
-        if packet[:len(Payload.SYNC_HEADER)] != Payload.SYNC_HEADER:
-            raise ValueError("invalid sync header")
-        data_and_crc = packet[len(Payload.SYNC_HEADER):]
-        data, crc = data_and_crc[:-1], data_and_crc[-1]
-        calc_crc = cls.calculate_crc8(data)
-        if crc != calc_crc:
-            raise ValueError("CRC mismatch.")
-        code, pfwd, sfwd, paft, saft = struct.unpack(cls.PACK_FORMAT, data)
+        elif status != cls.OKAY:
+            raise ValueError(cls.STATUS_MESSAGES[status])
+        code, pfwd, sfwd, paft, saft = struct.unpack_from(cls.PACK_FORMAT, packet, len(Payload.SYNC_HEADER))
         command = Command.from_code(code.decode('ascii'))
         return cls(command, pfwd, sfwd, paft, saft)
 
     @staticmethod
-    def calculate_crc8(data: bytes) -> int:
-        crc = 0
-        for b in data:
-            crc = CRC8_TABLE[crc ^ b]
-        return crc
+    def calculate_crc8(data, start=0, end=None) -> int:
+        '''
+        Return the CRC8 of data[start:end], calculated in place. The data
+        must be a buffer (bytes, bytearray or memoryview); a list or tuple of
+        ints is rejected with a TypeError.
+        '''
+        if end is None:
+            end = len(data)
+        return _crc8(data, start, end)
 
     @staticmethod
     def encode_int(value_32_bit_int):